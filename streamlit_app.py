@@ -7,44 +7,57 @@ Each project is serialized into the URL `data` parameter; every tab gets its own
 plan unless you share the link.
 """
 
-import json, io, base64, zlib, time
+import io, zlib, time, warnings
 from typing import List, Dict, Any
 
+import orjson
+import pybase64
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont
+from fpdf import FPDF
+from PIL import Image, ImageDraw, ImageFont, features
 
 st.set_page_config(page_title="🎬 Scene & Shot Planner", page_icon="🎬", layout="wide")
 st.title("🎬 Scene & Shot Planner")
 
 SHOT_CYCLE = ["Wide", "Medium Shot", "Close‑Up", None]
+SHOT_CHOICES = ("Wide", "Medium Shot", "Close‑Up")
+SHOT_CHOICE_IDX = {c: i for i, c in enumerate(SHOT_CHOICES)}
 
 # ---------------------------------------------------------------------------
 # URL‑based storage helpers
 # ---------------------------------------------------------------------------
 
-def encode_scenes(scenes: List[Dict[str, Any]]) -> str:
-    """Compress + base64 the scenes list, excluding live file objects."""
-    def strip_files(obj):
-        return [
-            {
-                **sc,
-                "shots": [{k: v for k, v in sh.items() if k != "file"} for sh in sc["shots"]],
-            }
-            for sc in obj
-        ]
+# Preset deflate dictionary: one blank scene as orjson serializes it. Tokens made
+# with it carry the FDICT flag + dictionary checksum in their zlib header, so
+# decode_scenes still reads older unprimed tokens. Never edit this in place –
+# existing links depend on the exact bytes.
+_ZDICT = (
+    b'{"id":1,"title":"","hook":"","problem":"","conflict":"","resolution":"","shots":['
+    b'{"id":1,"type":"Wide","alt_type":null,"description":""},'
+    b'{"id":2,"type":"Medium Shot","alt_type":null,"description":""},'
+    b'{"id":3,"type":"Close\xe2\x80\x91Up","alt_type":null,"description":""},'
+    b'{"id":4,"type":null,"alt_type":"Wide","description":""}]}'
+)
+
+def _pack_token(raw: bytes) -> str:
+    """Compress + base64 scenes already serialized with ``orjson.dumps``."""
+    comp = zlib.compressobj(1, zdict=_ZDICT)
+    compressed = comp.compress(raw) + comp.flush()
+    return pybase64.urlsafe_b64encode(compressed).decode()
 
-    raw = json.dumps(strip_files(scenes)).encode()
-    compressed = zlib.compress(raw)
-    return base64.urlsafe_b64encode(compressed).decode()
+
+def encode_scenes(scenes: List[Dict[str, Any]]) -> str:
+    """Compress + base64 the scenes list (plain JSON data, no file objects)."""
+    return _pack_token(orjson.dumps(scenes))
 
 
 def decode_scenes(token: str) -> List[Dict[str, Any]]:
     try:
-        data = zlib.decompress(base64.urlsafe_b64decode(token)).decode()
-        scenes = json.loads(data)
+        compressed = pybase64.b64decode(token, altchars=b"-_", validate=False)
+        scenes = orjson.loads(zlib.decompressobj(zdict=_ZDICT).decompress(compressed))
         for sc in scenes:
             for sh in sc.get("shots", []):
-                sh.setdefault("file", None)
+                sh.pop("file", None)
         return scenes
     except Exception:
         return []
@@ -53,12 +66,17 @@ def decode_scenes(token: str) -> List[Dict[str, Any]]:
 # Load scenes from URL or start empty
 # ---------------------------------------------------------------------------
 
-params = st.query_params  # new API
-initial_token = params.get("data", "")
-initial_scenes: List[Dict[str, Any]] = decode_scenes(initial_token) if initial_token else []
-
+# Decode only on a session's first run; afterwards ?data= just mirrors state.
 if "scenes" not in st.session_state:
-    st.session_state.scenes = initial_scenes
+    initial_token = st.query_params.get("data", "")  # new API
+    st.session_state.scenes = decode_scenes(initial_token) if initial_token else []
+# Uploaded images live beside the scenes, keyed by (scene_idx, shot_idx), so the
+# scenes list stays plain JSON data.
+if "shot_files" not in st.session_state:
+    st.session_state.shot_files = {}
+# Raw bytes of each upload, keyed by UploadedFile.file_id, read once for previews.
+if "img_cache" not in st.session_state:
+    st.session_state.img_cache = {}
 
 # ---------------------------------------------------------------------------
 # Scene/shot factory
@@ -71,7 +89,6 @@ def make_scene(idx: int) -> Dict[str, Any]:
             "type": t,
             "alt_type": "Wide" if t is None else None,
             "description": "",
-            "file": None,
         }
         for i, t in enumerate(SHOT_CYCLE)
     ]
@@ -97,6 +114,8 @@ with col_add:
 with col_reset:
     if st.button("🗑️ Reset All", type="secondary"):
         st.session_state.scenes.clear()
+        st.session_state.shot_files.clear()
+        st.session_state.img_cache.clear()
 
 st.divider()
 
@@ -104,77 +123,124 @@ st.divider()
 # Scene editor loop
 # ---------------------------------------------------------------------------
 
-for scene_idx, scene in enumerate(st.session_state.scenes):
-    with st.container():
-        st.subheader(f"Scene {scene['id']}")
-        scene["title"] = st.text_area("Scene Title", scene["title"], key=f"title_{scene_idx}")
-        scene["hook"] = st.text_area("Hook", scene["hook"], key=f"hook_{scene_idx}")
-        scene["problem"] = st.text_area("Problem", scene["problem"], key=f"prob_{scene_idx}")
-        scene["conflict"] = st.text_area("Conflict", scene["conflict"], key=f"conf_{scene_idx}")
-        scene["resolution"] = st.text_area("Resolution", scene["resolution"], key=f"res_{scene_idx}")
-
-        st.markdown("**Shots** (4 per scene)")
-        for shot_idx, shot in enumerate(scene["shots"]):
-            with st.expander(f"Shot {shot['id']}"):
-                if shot["type"] is None:
-                    shot["alt_type"] = st.selectbox(
-                        "Shot Size",
-                        ["Wide", "Medium Shot", "Close‑Up"],
-                        index=["Wide", "Medium Shot", "Close‑Up"].index(shot["alt_type"]),
-                        key=f"stype_{scene_idx}_{shot_idx}",
-                    )
-                    shot_type_display = shot["alt_type"]
-                else:
-                    shot_type_display = shot["type"]
-                    st.markdown(f"**Type:** {shot_type_display}")
-
-                shot["description"] = st.text_area(
-                    "Description / Action", shot["description"], key=f"sdesc_{scene_idx}_{shot_idx}"
-                )
-
-                shot["file"] = st.file_uploader(
-                    "Inspiration Image (optional)",
-                    type=["png", "jpg", "jpeg"],
-                    key=f"sfile_{scene_idx}_{shot_idx}",
-                )
-                if shot["file"] is not None:
-                    shot["file"].seek(0)
-                    st.image(
-                        shot["file"],
-                        caption=f"Scene {scene['id']} – Shot {shot['id']} ({shot_type_display})",
-                        use_container_width=True,
-                    )
-        st.divider()
+# Edits are batched in a form so typing doesn't rerun the whole script on every
+# keystroke. Re-serialization is gated separately by the scenes fingerprint below,
+# so Add Scene / Reset All are persisted too.
+if st.session_state.scenes:
+    with st.form("scene_editor"):
+        for scene_idx, scene in enumerate(st.session_state.scenes):
+            with st.container():
+                st.subheader(f"Scene {scene['id']}")
+                scene["title"] = st.text_area("Scene Title", scene["title"], key=f"title_{scene_idx}")
+                scene["hook"] = st.text_area("Hook", scene["hook"], key=f"hook_{scene_idx}")
+                scene["problem"] = st.text_area("Problem", scene["problem"], key=f"prob_{scene_idx}")
+                scene["conflict"] = st.text_area("Conflict", scene["conflict"], key=f"conf_{scene_idx}")
+                scene["resolution"] = st.text_area("Resolution", scene["resolution"], key=f"res_{scene_idx}")
+
+                st.markdown("**Shots** (4 per scene)")
+                for shot_idx, shot in enumerate(scene["shots"]):
+                    with st.expander(f"Shot {shot['id']}"):
+                        if shot["type"] is None:
+                            shot["alt_type"] = st.selectbox(
+                                "Shot Size",
+                                SHOT_CHOICES,
+                                index=SHOT_CHOICE_IDX[shot["alt_type"]],
+                                key=f"stype_{scene_idx}_{shot_idx}",
+                            )
+                            shot_type_display = shot["alt_type"]
+                        else:
+                            shot_type_display = shot["type"]
+                            st.markdown(f"**Type:** {shot_type_display}")
+
+                        shot["description"] = st.text_area(
+                            "Description / Action", shot["description"], key=f"sdesc_{scene_idx}_{shot_idx}"
+                        )
+
+                        shot_file = st.file_uploader(
+                            "Inspiration Image (optional)",
+                            type=["png", "jpg", "jpeg"],
+                            key=f"sfile_{scene_idx}_{shot_idx}",
+                        )
+                        st.session_state.shot_files[(scene_idx, shot_idx)] = shot_file
+                        if shot_file is not None:
+                            img_bytes = st.session_state.img_cache.get(shot_file.file_id)
+                            if img_bytes is None:
+                                img_bytes = shot_file.getvalue()
+                                st.session_state.img_cache[shot_file.file_id] = img_bytes
+                            st.image(
+                                img_bytes,
+                                caption=f"Scene {scene['id']} – Shot {shot['id']} ({shot_type_display})",
+                                use_container_width=True,
+                            )
+                st.divider()
+        st.form_submit_button("💾 Save Changes", type="primary")
+
+    # Forget previews for uploads that were removed or replaced.
+    live_ids = {f.file_id for f in st.session_state.shot_files.values() if f is not None}
+    for file_id in st.session_state.img_cache.keys() - live_ids:
+        del st.session_state.img_cache[file_id]
 
 # ---------------------------------------------------------------------------
 # Persist scenes back to URL
 # ---------------------------------------------------------------------------
 
-st.query_params.update(data=encode_scenes(st.session_state.scenes))
+# Only re-encode (and touch the URL) when the scenes actually changed; most
+# reruns are button clicks or previews that leave the plan untouched.
+# The serialized bytes double as the fingerprint: key order is fixed by
+# make_scene/decode_scenes, so equal bytes mean equal scenes.
+scenes_raw = orjson.dumps(st.session_state.scenes)
+if st.session_state.get("last_scenes_raw") != scenes_raw:
+    st.session_state.last_token = _pack_token(scenes_raw)
+    st.session_state.last_scenes_raw = scenes_raw
+    # A fresh session opened from a shared link re-encodes to the same token.
+    if st.query_params.get("data") != st.session_state.last_token:
+        st.query_params["data"] = st.session_state.last_token
 
 # ---------------------------------------------------------------------------
-# Export helpers – JPEG + PDF (unchanged)
+# Export helpers – JPEG + PDF
 # ---------------------------------------------------------------------------
 
 def build_lines(scenes):
     lines = []
+    extend = lines.extend
     for sc in scenes:
-        lines.append(f"Scene {sc['id']}: {sc['title']}")
-        lines.append(f"  Hook: {sc['hook']}")
-        lines.append(f"  Problem: {sc['problem']}")
-        lines.append(f"  Conflict: {sc['conflict']}")
-        lines.append(f"  Resolution: {sc['resolution']}")
-        for sh in sc["shots"]:
-            stype = sh['type'] if sh['type'] else sh['alt_type']
-            lines.append(f"    Shot {sh['id']} ({stype}) – {sh['description']}")
+        extend((
+            f"Scene {sc['id']}: {sc['title']}",
+            f"  Hook: {sc['hook']}",
+            f"  Problem: {sc['problem']}",
+            f"  Conflict: {sc['conflict']}",
+            f"  Resolution: {sc['resolution']}",
+        ))
+        extend(
+            f"    Shot {sh['id']} ({sh['type'] or sh['alt_type']}) – {sh['description']}"
+            for sh in sc["shots"]
+        )
         lines.append("")
     return lines
 
-def scenes_to_jpeg(scenes):
-    lines = build_lines(scenes)
+# Script-level code reruns on every interaction: keep plain constants for cheap
+# values and use cache_resource only for real setup work like this.
+@st.cache_resource
+def _export_font():
+    """Default font and its line height, built once per process (not per rerun).
+
+    Also the one-time JPEG setup hook, so the libjpeg-turbo warning fires once.
+    """
+    if not features.check_feature("libjpeg_turbo"):
+        warnings.warn("Pillow is not built against libjpeg-turbo; JPEG export will be slower.")
     font = ImageFont.load_default()
-    lh = font.getbbox('Hg')[3] + 4
-    w = int(max(font.getlength(l) for l in lines) + 20)
+    return font, font.getbbox('Hg')[3] + 4
+
+# Export caches are process‑wide (shared by all sessions); keep them small and
+# short‑lived since only each session's current plan is ever downloaded.
+_EXPORT_CACHE = dict(show_spinner=False, max_entries=8, ttl=3600)
+
+@st.cache_data(**_EXPORT_CACHE)
+def _lines_to_jpeg(lines):
+    """Rasterize the plan text; cached so reruns don't redraw an unchanged plan."""
+    font, lh = _export_font()
+    # Measure each distinct line once; blank separators and unfilled shot lines repeat a lot.
+    w = int(max(map(font.getlength, set(lines))) + 20)
     h = lh * len(lines) + 20
     img = Image.new('RGB', (w, h), 'white')
     draw = ImageDraw.Draw(img)
@@ -183,15 +249,33 @@ def scenes_to_jpeg(scenes):
         draw.text((10, y), line, fill='black', font=font)
         y += lh
     buf = io.BytesIO()
-    img.save(buf, format='JPEG', quality=95, subsampling=0, optimize=True)
+    img.save(buf, format='JPEG', quality=90, subsampling=2)
     return buf.getvalue()
 
+# The core PDF fonts are Latin‑1 only; map the typographic dashes we emit ourselves.
+_PDF_CHARMAP = str.maketrans({"–": "-", "‑": "-"})
+
+def _pdf_safe(line):
+    return line.translate(_PDF_CHARMAP).encode('latin-1', 'replace').decode('latin-1')
+
+@st.cache_data(**_EXPORT_CACHE)
+def _lines_to_pdf(lines):
+    """Write the plan as PDF text (no raster round‑trip); cached like the JPEG."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Helvetica', size=10)
+    for line in lines:
+        if line:
+            pdf.multi_cell(0, 5, _pdf_safe(line), new_x='LMARGIN', new_y='NEXT')
+        else:
+            pdf.ln(5)
+    return bytes(pdf.output())
+
+def scenes_to_jpeg(scenes):
+    return _lines_to_jpeg(tuple(build_lines(scenes)))
+
 def scenes_to_pdf(scenes):
-    jpeg_bytes = scenes_to_jpeg(scenes)
-    img = Image.open(io.BytesIO(jpeg_bytes))
-    buf = io.BytesIO()
-    img.save(buf, format='PDF')
-    return buf.getvalue()
+    return _lines_to_pdf(tuple(build_lines(scenes)))
 
 # ---------------------------------------------------------------------------
 # Download buttons